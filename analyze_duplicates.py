@@ -3,9 +3,25 @@
 Analyze duplicate patterns in MAP CSV file
 """
 import csv
-from collections import defaultdict, Counter
+import io
+import multiprocessing
+import os
+from collections import defaultdict, Counter, namedtuple
+from itertools import groupby
+from operator import itemgetter
 import sys
 
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+except ImportError:
+    pa = pacsv = None
+
 csv.field_size_limit(sys.maxsize)
 
 FILE_PATH = "/Users/andymontgomery/Downloads/map-export-athena_02_04.csv"
@@ -23,51 +39,225 @@ COLS = {
     'grade': 154,
 }
 
+# Compact per-row record: a namedtuple costs a fraction of the memory of a
+# dict per instance and makes attribute access faster than keyed lookup.
+Row = namedtuple('Row', [
+    'row_num', 'testritscore', 'classname', 'teachername',
+    'teststarttime', 'grade', 'teststartdate',
+])
+
+# Fields checked for differences within a duplicate group
+DIFF_FIELDS = ('testritscore', 'classname', 'teachername', 'teststarttime', 'grade')
+
+# Below this file size the fallback loader parses serially; pool startup
+# and pickling would cost more than the parse.
+PARALLEL_THRESHOLD_BYTES = 8 * 1024 * 1024
+
+# Records handed to each worker task
+RECORDS_PER_BATCH = 20000
+
+
+def _make_entry(row_num, row):
+    """Build one (studentid, subject, teststartdate, termname, Row) entry.
+
+    The heavily repeated columns are interned: the same id/subject/term/
+    class/teacher strings recur thousands of times across the export, and
+    interning collapses them to one object each (with cached hashes for
+    the grouping sorts). Interned duplicates also pickle as a single
+    object per worker batch on the parallel path.
+    """
+    teststartdate = sys.intern(row[COLS['teststartdate']])
+    return (
+        sys.intern(row[COLS['studentid']]),
+        sys.intern(row[COLS['subject']]),
+        teststartdate,
+        sys.intern(row[COLS['termname']]),
+        Row(
+            row_num,
+            row[COLS['testritscore']],
+            sys.intern(row[COLS['classname']]),
+            sys.intern(row[COLS['teachername']]),
+            row[COLS['teststarttime']],
+            sys.intern(row[COLS['grade']]),
+            teststartdate,
+        ),
+    )
+
+
+def _parse_batch(batch):
+    """Worker: parse one batch of complete CSV records into entries."""
+    start_row_num, text = batch
+    return [
+        _make_entry(row_num, row)
+        for row_num, row in enumerate(csv.reader(io.StringIO(text)), start=start_row_num)
+        if len(row) >= 155
+    ]
+
+
+def _iter_record_batches(f, records_per_batch=RECORDS_PER_BATCH):
+    """Yield (start_row_num, text) batches of whole CSV records.
+
+    A record only ends on a line with balanced quotes, so quoted embedded
+    newlines never get split across batches.
+    """
+    start_row_num = 2  # header is line 1
+    lines = []
+    num_records = 0
+    open_quotes = 0
+    for line in f:
+        lines.append(line)
+        open_quotes += line.count('"')
+        if open_quotes % 2:
+            continue
+        open_quotes = 0
+        num_records += 1
+        if num_records >= records_per_batch:
+            yield (start_row_num, ''.join(lines))
+            start_row_num += num_records
+            lines = []
+            num_records = 0
+    if lines:
+        yield (start_row_num, ''.join(lines))
+
+
+def _load_rows_csv():
+    """Pure-Python fallback loader: stream the CSV with the stdlib reader.
+
+    Rather than paying two hashed dict inserts per row, collect one flat
+    list of (studentid, subject, teststartdate, termname, Row) entries,
+    then sort and group linearly with itertools.groupby -- once per key.
+    The second sort is over nearly-sorted data, which Timsort handles
+    cheaply.
+
+    Large files fan the parse out over a process pool in record batches;
+    tokenizing 155 columns per row is the dominant cost and is
+    embarrassingly parallel.
+    """
+    parallel = (
+        os.path.getsize(FILE_PATH) > PARALLEL_THRESHOLD_BYTES
+        and (os.cpu_count() or 1) > 1
+    )
+
+    with open(FILE_PATH, 'r', encoding='utf-8') as f:
+        if parallel:
+            f.readline()  # header
+            with multiprocessing.Pool() as pool:
+                entries = [
+                    entry
+                    for batch_entries in pool.imap(_parse_batch, _iter_record_batches(f))
+                    for entry in batch_entries
+                ]
+        else:
+            reader = csv.reader(f)
+            header = next(reader)
+            entries = [
+                _make_entry(row_num, row)
+                for row_num, row in enumerate(reader, start=2)
+                if len(row) >= 155
+            ]
+
+    total_rows = len(entries)
+
+    date_key = itemgetter(0, 1, 2)  # (studentid, subject, teststartdate)
+    entries.sort(key=date_key)
+    rows_by_key = {k: [e[4] for e in g] for k, g in groupby(entries, key=date_key)}
+
+    term_key = itemgetter(0, 1, 3)  # (studentid, subject, termname)
+    entries.sort(key=term_key)
+    rows_by_student_subject_term = {k: [e[4] for e in g] for k, g in groupby(entries, key=term_key)}
+
+    return total_rows, rows_by_key, rows_by_student_subject_term
+
+
+def _read_frame():
+    """Read only the 9 needed columns into a DataFrame.
+
+    Prefers Arrow's multithreaded C++ CSV reader, which projects columns
+    during tokenization so the 145 unused columns are never materialized.
+    Falls back to pandas' C engine with usecols when pyarrow is missing.
+    """
+    col_idx = sorted(COLS.values())
+    col_names = {v: k for k, v in COLS.items()}
+
+    if pacsv is not None:
+        # include_columns needs header names, so grab the header row first.
+        with open(FILE_PATH, 'r', encoding='utf-8') as f:
+            header = next(csv.reader(f))
+        include = [header[i] for i in col_idx]
+        table = pacsv.read_csv(
+            FILE_PATH,
+            # Arrow enforces the schema width; skip truncated rows the way
+            # the fallback loader does. (Row numbers after a skipped row
+            # drift by one, which only matters for malformed exports.)
+            parse_options=pacsv.ParseOptions(invalid_row_handler=lambda _row: 'skip'),
+            convert_options=pacsv.ConvertOptions(
+                include_columns=include,
+                column_types={name: pa.string() for name in include},
+            ),
+        )
+        df = table.to_pandas()
+    else:
+        df = pd.read_csv(
+            FILE_PATH,
+            usecols=col_idx,
+            dtype=str,
+            # Only empty/missing fields become NaN; strings like "NA"
+            # survive untouched.
+            keep_default_na=False,
+            na_values=[''],
+            encoding='utf-8',
+        )
+        # Truncated rows are NaN-padded by pandas rather than skipped.
+        # A row short of 155 fields is missing grade (index 154, the
+        # last projected column), so dropping grade-NaN rows matches
+        # the stdlib loader's len(row) >= 155 check.
+        df = df[df[df.columns[-1]].notna()]
+        df = df.fillna('')
+
+    df.columns = [col_names[i] for i in col_idx]
+    return df
+
+
+def _load_rows_pandas():
+    """Vectorized loader: parse only the 9 needed columns with a C CSV
+    engine and group with groupby, instead of tokenizing all 155 columns
+    of every row in Python.
+    """
+    df = _read_frame()
+
+    row_nums = df.index + 2  # header is line 1
+    rows = [
+        Row(n, t.testritscore, t.classname, t.teachername,
+            t.teststarttime, t.grade, t.teststartdate)
+        for n, t in zip(row_nums, df.itertuples(index=False))
+    ]
+
+    rows_by_key = {
+        key: [rows[i] for i in idx]
+        for key, idx in df.groupby(
+            ['studentid', 'subject', 'teststartdate'], sort=False).indices.items()
+    }
+    rows_by_student_subject_term = {
+        key: [rows[i] for i in idx]
+        for key, idx in df.groupby(
+            ['studentid', 'subject', 'termname'], sort=False).indices.items()
+    }
+
+    return len(rows), rows_by_key, rows_by_student_subject_term
+
+
+def _load_rows():
+    if pd is not None:
+        return _load_rows_pandas()
+    return _load_rows_csv()
+
+
 def analyze_duplicates():
     print("="*80)
     print("MAP CSV DUPLICATE ANALYSIS")
     print("="*80)
 
-    # Read all data
-    rows_by_key = defaultdict(list)  # key = (studentid, subject, teststartdate)
-    rows_by_student_subject_term = defaultdict(list)  # key = (studentid, subject, termname)
-    all_rows = []
-
-    with open(FILE_PATH, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        header = next(reader)
-
-        for row_num, row in enumerate(reader, start=2):
-            if len(row) < 155:
-                continue
-
-            studentid = row[COLS['studentid']]
-            subject = row[COLS['subject']]
-            teststartdate = row[COLS['teststartdate']]
-            termname = row[COLS['termname']]
-
-            key = (studentid, subject, teststartdate)
-            term_key = (studentid, subject, termname)
-
-            row_data = {
-                'row_num': row_num,
-                'termname': termname,
-                'studentid': studentid,
-                'subject': subject,
-                'teststartdate': teststartdate,
-                'teststarttime': row[COLS['teststarttime']],
-                'testritscore': row[COLS['testritscore']],
-                'classname': row[COLS['classname']],
-                'teachername': row[COLS['teachername']],
-                'grade': row[COLS['grade']],
-                'full_row': row
-            }
-
-            rows_by_key[key].append(row_data)
-            rows_by_student_subject_term[term_key].append(row_data)
-            all_rows.append(row_data)
-
-    total_rows = len(all_rows)
+    total_rows, rows_by_key, rows_by_student_subject_term = _load_rows()
     unique_keys = len(rows_by_key)
 
     print(f"\n1. BASIC COUNTS")
@@ -81,43 +271,48 @@ def analyze_duplicates():
     print("-"*40)
 
     dup_groups = {k: v for k, v in rows_by_key.items() if len(v) > 1}
+    dup_group_rows = sum(len(v) for v in dup_groups.values())
     print(f"Number of duplicate groups: {len(dup_groups)}")
-    print(f"Total rows in duplicate groups: {sum(len(v) for v in dup_groups.values())}")
+    print(f"Total rows in duplicate groups: {dup_group_rows}")
 
-    # Analyze what columns differ in duplicates
+    # Analyze what columns differ in duplicates; count rows per pattern
+    # as we go so the print loops below don't re-sum the groups.
     diff_patterns = defaultdict(list)
+    pattern_row_counts = Counter()
 
     for key, rows in dup_groups.items():
-        # Compare all rows in group
-        differing_cols = set()
+        # A column differs within the group iff some row disagrees with the
+        # first one. Scan the rows once, dropping a field from the check
+        # set as soon as it's flagged, and stop early when every field has
+        # differed -- no point comparing the rest of the group.
         base = rows[0]
-
+        differing_cols = set()
+        remaining = set(DIFF_FIELDS)
         for r in rows[1:]:
-            if r['testritscore'] != base['testritscore']:
-                differing_cols.add('testritscore')
-            if r['classname'] != base['classname']:
-                differing_cols.add('classname')
-            if r['teachername'] != base['teachername']:
-                differing_cols.add('teachername')
-            if r['teststarttime'] != base['teststarttime']:
-                differing_cols.add('teststarttime')
-            if r['grade'] != base['grade']:
-                differing_cols.add('grade')
+            found = {f for f in remaining if getattr(r, f) != getattr(base, f)}
+            if found:
+                differing_cols |= found
+                remaining -= found
+                if not remaining:
+                    break
 
         pattern = tuple(sorted(differing_cols)) if differing_cols else ('IDENTICAL',)
         diff_patterns[pattern].append((key, rows))
+        pattern_row_counts[pattern] += len(rows)
+
+    sorted_patterns = sorted(diff_patterns.items(), key=lambda x: -len(x[1]))
 
     print(f"\nDifference patterns found:")
-    for pattern, groups in sorted(diff_patterns.items(), key=lambda x: -len(x[1])):
+    for pattern, groups in sorted_patterns:
         print(f"\n  Pattern: {', '.join(pattern)}")
-        print(f"  Count: {len(groups)} groups ({sum(len(g[1]) for g in groups)} total rows)")
+        print(f"  Count: {len(groups)} groups ({pattern_row_counts[pattern]} total rows)")
 
         # Show examples
         print(f"  Examples (up to 3):")
         for i, (key, rows) in enumerate(groups[:3]):
             print(f"    Group {i+1}: studentid={key[0]}, subject={key[1]}, date={key[2]}")
             for r in rows:
-                print(f"      Row {r['row_num']}: score={r['testritscore']}, class={r['classname'][:30] if r['classname'] else 'N/A'}, teacher={r['teachername'][:25] if r['teachername'] else 'N/A'}")
+                print(f"      Row {r.row_num}: score={r.testritscore}, class={r.classname[:30] if r.classname else 'N/A'}, teacher={r.teachername[:25] if r.teachername else 'N/A'}")
 
     # Same student, same subject, DIFFERENT dates in same term
     print(f"\n3. SAME STUDENT + SUBJECT WITH DIFFERENT DATES IN SAME TERM")
@@ -128,7 +323,7 @@ def analyze_duplicates():
     # Filter to only those with actually different dates
     different_dates_groups = {}
     for key, rows in multi_date_groups.items():
-        dates = set(r['teststartdate'] for r in rows)
+        dates = set(r.teststartdate for r in rows)
         if len(dates) > 1:
             different_dates_groups[key] = rows
 
@@ -137,7 +332,7 @@ def analyze_duplicates():
     # Analyze patterns
     retake_patterns = defaultdict(list)
     for key, rows in different_dates_groups.items():
-        dates = sorted(set(r['teststartdate'] for r in rows))
+        dates = sorted(set(r.teststartdate for r in rows))
         num_dates = len(dates)
         retake_patterns[num_dates].append((key, rows, dates))
 
@@ -151,7 +346,7 @@ def analyze_duplicates():
         for i, (key, rows, dates) in enumerate(groups[:3]):
             print(f"    Student {key[0]}, Subject: {key[1]}, Term: {key[2]}")
             print(f"      Dates: {dates}")
-            print(f"      Scores: {[r['testritscore'] for r in sorted(rows, key=lambda x: x['teststartdate'])]}")
+            print(f"      Scores: {[r.testritscore for r in sorted(rows, key=lambda x: x.teststartdate)]}")
 
     # Summary and recommendations
     print(f"\n" + "="*80)
@@ -159,8 +354,8 @@ def analyze_duplicates():
     print("="*80)
 
     print(f"\nDUPLICATION TYPE 1: Same studentid + subject + teststartdate")
-    print(f"  Total occurrences: {len(dup_groups)} groups ({sum(len(v) for v in dup_groups.values())} rows)")
-    for pattern, groups in sorted(diff_patterns.items(), key=lambda x: -len(x[1])):
+    print(f"  Total occurrences: {len(dup_groups)} groups ({dup_group_rows} rows)")
+    for pattern, groups in sorted_patterns:
         print(f"\n  Sub-pattern: {', '.join(pattern)}")
         print(f"    Count: {len(groups)} groups")
         if pattern == ('IDENTICAL',):
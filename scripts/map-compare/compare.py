@@ -11,13 +11,30 @@ field-by-field comparison report.
 """
 
 import json
+import os
 import sys
 import re
 import argparse
 from collections import Counter, defaultdict
 from datetime import datetime
+from functools import lru_cache, wraps
 from pathlib import Path
 
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 # --- Subject Normalization ---
 
@@ -36,6 +53,12 @@ SUBJECT_NORMALIZATIONS = {
 }
 
 
+# Leading triangle/bullet characters (plus any whitespace they drag along)
+# that NWEA prepends to expandable subject rows
+_SUBJECT_PREFIX_RE = re.compile(r'^[\u25be\u25b8\u2022\u00b7\s]+')
+
+
+@lru_cache(maxsize=None)
 def normalize_subject(subj):
     """Normalize subject names for matching.
 
@@ -45,8 +68,10 @@ def normalize_subject(subj):
     if not subj:
         return None
     s = subj.strip()
-    # Strip leading triangle/bullet characters and whitespace
-    s = re.sub(r'^[\u25be\u25b8\u2022\u00b7\s]+', '', s)
+    # The prefix characters are all non-ASCII (and whitespace is already
+    # stripped), so ASCII subject names skip the regex entirely.
+    if not s.isascii():
+        s = _SUBJECT_PREFIX_RE.sub('', s)
     return SUBJECT_NORMALIZATIONS.get(s, s)
 
 
@@ -96,13 +121,45 @@ SUMMARY_FIELDS = [
 ]
 
 
+# Sentinel strings treated as missing values
+_NULL_SENTINELS = frozenset(('\u2014', '-', '***', '', 'null', 'None'))
+
+# Types safe to use as lru_cache keys
+_CACHEABLE_TYPES = (str, int, float, type(None))
+
+
+def _cache_scalars(func):
+    """lru_cache that only engages when every argument is a hashable scalar.
+
+    Field values are occasionally malformed (a dict or list where a scalar
+    belongs); those fall through to the uncached function, as before
+    memoization, instead of raising TypeError from the cache's hash.
+    """
+    cached = lru_cache(maxsize=None)(func)
+
+    @wraps(func)
+    def wrapper(*args):
+        if all(isinstance(a, _CACHEABLE_TYPES) for a in args):
+            return cached(*args)
+        return func(*args)
+
+    wrapper.cache_clear = cached.cache_clear
+    return wrapper
+
+
+@_cache_scalars
 def normalize_value(val):
-    """Normalize a value for comparison."""
+    """Normalize a value for comparison.
+
+    Values are JSON scalars (str/int/float/None), so they hash cheaply and
+    the same handful of raw strings recur across every student -- a small
+    cache skips the strip/sentinel work on repeats.
+    """
     if val is None:
         return None
     if isinstance(val, str):
         val = val.strip()
-        if val in ('\u2014', '-', '***', '', 'null', 'None'):
+        if val in _NULL_SENTINELS:
             return None
         return val
     return val
@@ -141,8 +198,14 @@ def compare_range(nwea_range, app_range):
     Returns diff dict or None if match.
     """
     if isinstance(nwea_range, dict) and isinstance(app_range, dict):
-        nwea_mid = normalize_value(nwea_range.get('mid'))
-        app_mid = normalize_value(app_range.get('mid'))
+        # Mids are usually already numbers, for which normalize_value is a
+        # no-op; only strings/None need the strip-and-sentinel treatment.
+        nwea_mid = nwea_range.get('mid')
+        if not isinstance(nwea_mid, (int, float)):
+            nwea_mid = normalize_value(nwea_mid)
+        app_mid = app_range.get('mid')
+        if not isinstance(app_mid, (int, float)):
+            app_mid = normalize_value(app_mid)
 
         if nwea_mid is None and app_mid is None:
             return None
@@ -178,8 +241,13 @@ def compare_range(nwea_range, app_range):
     return None
 
 
+@_cache_scalars
 def compare_exact_int(nwea_val, app_val):
-    """Compare exact integer values. Returns diff or None."""
+    """Compare exact integer values. Returns diff or None.
+
+    Memoized: the same (nwea, app) scalar pairs recur across students, and
+    callers treat the returned diff dict as read-only.
+    """
     nwea_val = normalize_value(nwea_val)
     app_val = normalize_value(app_val)
 
@@ -202,8 +270,12 @@ def compare_exact_int(nwea_val, app_val):
     return None
 
 
+@_cache_scalars
 def compare_decimal(nwea_val, app_val, tolerance):
-    """Compare decimal values with tolerance. Returns diff or None."""
+    """Compare decimal values with tolerance. Returns diff or None.
+
+    Memoized like compare_exact_int; tolerance is part of the cache key.
+    """
     nwea_val = normalize_value(nwea_val)
     app_val = normalize_value(app_val)
 
@@ -227,8 +299,10 @@ def compare_decimal(nwea_val, app_val, tolerance):
     return None
 
 
+@_cache_scalars
 def compare_text(nwea_val, app_val):
-    """Compare text values case-insensitively."""
+    """Compare text values case-insensitively. Memoized like
+    compare_exact_int."""
     nwea_val = normalize_value(nwea_val)
     app_val = normalize_value(app_val)
 
@@ -243,57 +317,85 @@ def compare_text(nwea_val, app_val):
     return None
 
 
-def compare_student(nwea_student, app_student):
-    """Compare all fields for a single student. Returns dict of diffs."""
-    diffs = {}
-
-    # RIT range fields
-    for field in RIT_RANGE_FIELDS:
-        diff = compare_range(nwea_student.get(field, {}), app_student.get(field, {}))
-        if diff:
-            diffs[field] = diff
+def _build_compare_student_src():
+    """Emit source for a straight-line compare_student.
 
-    # Percentile range fields
-    for field in PERCENTILE_RANGE_FIELDS:
-        diff = compare_range(nwea_student.get(field, {}), app_student.get(field, {}))
-        if diff:
-            diffs[field] = diff
+    The field lists are fixed at module load, so instead of looping over
+    them and dispatching to a helper per field on every call, generate one
+    unrolled block per field once at import time. The hot exact-int fields
+    get normalize_value and the int coercion inlined as well, which drops
+    several function-call frames per matched student.
+    """
+    lines = [
+        'def compare_student(nwea_student, app_student):',
+        '    """Compare all fields for a single student. Returns dict of diffs."""',
+        '    diffs = {}',
+    ]
+
+    for field in RIT_RANGE_FIELDS + PERCENTILE_RANGE_FIELDS:
+        lines += [
+            f'    d = compare_range(nwea_student.get({field!r}, {{}}), app_student.get({field!r}, {{}}))',
+            '    if d:',
+            f'        diffs[{field!r}] = d',
+        ]
 
-    # Exact integer fields
     for field in EXACT_INT_FIELDS:
-        diff = compare_exact_int(nwea_student.get(field), app_student.get(field))
-        if diff:
-            diffs[field] = diff
+        lines += [
+            f'    n = nwea_student.get({field!r})',
+            '    if isinstance(n, str):',
+            '        n = n.strip()',
+            '        if n in _NULL_SENTINELS:',
+            '            n = None',
+            f'    a = app_student.get({field!r})',
+            '    if isinstance(a, str):',
+            '        a = a.strip()',
+            '        if a in _NULL_SENTINELS:',
+            '            a = None',
+            '    if n is not None or a is not None:',
+            '        try:',
+            '            if n is not None:',
+            '                n = int(round(float(n)))',
+            '            if a is not None:',
+            '                a = int(round(float(a)))',
+            '        except (ValueError, TypeError):',
+            '            pass',
+            '        if n != a:',
+            '            delta = a - n if isinstance(n, (int, float)) and isinstance(a, (int, float)) else None',
+            f"            diffs[{field!r}] = {{'nwea': n, 'app': a, 'delta': delta}}",
+        ]
 
-    # Decimal fields
     for field, tolerance in DECIMAL_FIELDS.items():
-        diff = compare_decimal(nwea_student.get(field), app_student.get(field), tolerance)
-        if diff:
-            diffs[field] = diff
-
-    # Grade
-    diff = compare_text(nwea_student.get('grade'), app_student.get('grade'))
-    if diff:
-        diffs['grade'] = diff
-
-    # Date
-    diff = compare_text(normalize_date(nwea_student.get('date')), normalize_date(app_student.get('date')))
-    if diff:
-        diffs['date'] = diff
+        lines += [
+            f'    d = compare_decimal(nwea_student.get({field!r}), app_student.get({field!r}), {tolerance!r})',
+            '    if d:',
+            f'        diffs[{field!r}] = d',
+        ]
+
+    lines += [
+        "    d = compare_text(nwea_student.get('grade'), app_student.get('grade'))",
+        '    if d:',
+        "        diffs['grade'] = d",
+        "    d = compare_text(normalize_date(nwea_student.get('date')), normalize_date(app_student.get('date')))",
+        '    if d:',
+        "        diffs['date'] = d",
+        '    d = compare_text(',
+        "        normalize_met_growth(nwea_student.get('metProjectedGrowth')),",
+        "        normalize_met_growth(app_student.get('metProjectedGrowth')),",
+        '    )',
+        '    if d:',
+        "        diffs['metProjectedGrowth'] = d",
+        '    return diffs',
+    ]
+    return '\n'.join(lines)
 
-    # Met Projected Growth
-    diff = compare_text(
-        normalize_met_growth(nwea_student.get('metProjectedGrowth')),
-        normalize_met_growth(app_student.get('metProjectedGrowth')),
-    )
-    if diff:
-        diffs['metProjectedGrowth'] = diff
 
-    return diffs
+# Defines compare_student at import time from the field lists above
+exec(compile(_build_compare_student_src(), '<compare_student>', 'exec'))
 
 
 def build_student_lookup(students):
-    """Build lookup dict from students array, keyed by studentId|normalizedSubject."""
+    """Build lookup dict from an iterable of students, keyed by
+    studentId|normalizedSubject."""
     lookup = {}
     for s in students:
         subj = normalize_subject(s.get('subject'))
@@ -305,17 +407,182 @@ def build_student_lookup(students):
     return lookup
 
 
-def generate_report(nwea_data, app_data):
-    """Generate full comparison report in markdown."""
-    lines = []
+# Above this size, prefer ijson's streaming parse (bounded memory) over a
+# faster whole-document load.
+_STREAM_THRESHOLD_BYTES = 64 * 1024 * 1024
+
 
-    # Build lookup maps with normalized subjects
-    nwea_students = build_student_lookup(nwea_data.get('students', []))
-    app_students = build_student_lookup(app_data.get('students', []))
+def load_student_lookup(path):
+    """Load an extraction JSON and return its student lookup.
 
-    matched_keys = set(nwea_students.keys()) & set(app_students.keys())
-    nwea_only = set(nwea_students.keys()) - set(app_students.keys())
-    app_only = set(app_students.keys()) - set(nwea_students.keys())
+    Small files are loaded in one shot with orjson when available (2-5x
+    faster than stdlib json), falling back to json.load. Files above
+    _STREAM_THRESHOLD_BYTES are streamed record by record with ijson so
+    the full parse tree is never materialized alongside the lookup.
+    """
+    if ijson is not None and os.path.getsize(path) > _STREAM_THRESHOLD_BYTES:
+        with open(path, 'rb') as f:
+            return build_student_lookup(ijson.items(f, 'students.item'))
+    if orjson is not None:
+        data = orjson.loads(Path(path).read_bytes())
+    else:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    return build_student_lookup(data.get('students', []))
+
+
+# Summary fields whose values are range dicts compared by mid value
+_SUMMARY_RANGE_FIELDS = frozenset(RIT_RANGE_FIELDS) | frozenset(PERCENTILE_RANGE_FIELDS)
+
+# The report only renders this many detail rows per field, so the
+# collectors stop recording rows past it; diff_counter keeps full totals.
+MAX_DETAIL_ROWS = 30
+
+
+def _detail_row(nwea_s, student_id, subject, nwea_val, app_val, delta):
+    """Build one detail-table row dict."""
+    return {
+        'student': f"{nwea_s.get('studentName', '?')} ({student_id})",
+        'subject': subject,
+        'nwea': nwea_val,
+        'app': app_val,
+        'delta': delta,
+    }
+
+
+def _collect_summary_diffs_python(nwea_students, app_students, matched_keys):
+    """Scalar fallback: run the per-student comparators key by key."""
+    diff_counter = Counter()
+    diff_details = {field: [] for field, _ in SUMMARY_FIELDS}
+
+    # matched_keys arrives pre-sorted from generate_report, so detail rows
+    # come out in a stable order without re-sorting here.
+    for key in matched_keys:
+        nwea_s = nwea_students[key]
+        app_s = app_students[key]
+        diffs = compare_student(nwea_s, app_s)
+        student_id, subject = key.split('|', 1)
+
+        for field, label in SUMMARY_FIELDS:
+            if field in diffs:
+                diff_counter[field] += 1
+                if len(diff_details[field]) < MAX_DETAIL_ROWS:
+                    d = diffs[field]
+                    diff_details[field].append(_detail_row(
+                        nwea_s, student_id, subject,
+                        d.get('nwea_mid', d.get('nwea')),
+                        d.get('app_mid', d.get('app')),
+                        d.get('delta'),
+                    ))
+
+    return diff_counter, diff_details
+
+
+def _collect_summary_diffs_pandas(nwea_students, app_students, matched_keys):
+    """Vectorized diff collection.
+
+    Aligns both lookups in DataFrames indexed by match key and compares
+    each summary field as a column operation, so the all-numeric common
+    case never enters a per-student Python comparator. Rows where either
+    side is not a plain number (sentinels, missing values, stray text)
+    are re-checked with the scalar comparators, keeping the semantics
+    identical to the fallback path.
+    """
+    keys = list(matched_keys)
+    nwea_df = pd.DataFrame.from_dict(nwea_students, orient='index').reindex(keys)
+    app_df = pd.DataFrame.from_dict(app_students, orient='index').reindex(keys)
+
+    diff_counter = Counter()
+    diff_details = {field: [] for field, _ in SUMMARY_FIELDS}
+
+    def _clean(series):
+        # Missing dict keys surface as NaN after from_dict; fold them into
+        # None so they behave like student.get(field) on the scalar path.
+        return series.map(lambda v: None if v is None or (isinstance(v, float) and v != v) else v)
+
+    split_keys = {key: key.split('|', 1) for key in keys}
+
+    for field, _label in SUMMARY_FIELDS:
+        is_range = field in _SUMMARY_RANGE_FIELDS
+        n_raw = _clean(nwea_df[field]) if field in nwea_df else pd.Series([None] * len(keys), index=keys)
+        a_raw = _clean(app_df[field]) if field in app_df else pd.Series([None] * len(keys), index=keys)
+
+        if is_range:
+            # Mirror the scalar path's student.get(field, {}): a range
+            # that is absent or malformed on one side contributes a None
+            # mid, so those rows land on the hard path below and
+            # compare_range decides -- in particular, a field present in
+            # only one extraction is reported, not silently skipped.
+            def _mid(v):
+                return normalize_value(v.get('mid')) if isinstance(v, dict) else None
+            n_vals = n_raw.map(_mid)
+            a_vals = a_raw.map(_mid)
+        else:
+            n_vals = n_raw.map(normalize_value)
+            a_vals = a_raw.map(normalize_value)
+
+        n_num = pd.to_numeric(n_vals, errors='coerce').round()
+        a_num = pd.to_numeric(a_vals, errors='coerce').round()
+
+        numeric_both = n_num.notna() & a_num.notna()
+        # Both mids/values missing is never a diff on the scalar path,
+        # whatever shape the surrounding objects have.
+        both_none = n_vals.isna() & a_vals.isna()
+        numeric_diff = numeric_both & (n_num != a_num)
+        # Anything that is neither all-numeric nor all-missing gets the
+        # scalar treatment below.
+        hard = ~numeric_both & ~both_none
+
+        # Emit in index (key) order, numeric and hard rows interleaved, so
+        # the capped detail tables select the same rows as the scalar path.
+        for key in n_num.index[numeric_diff | hard]:
+            if numeric_diff[key]:
+                nwea_val = int(n_num[key])
+                app_val = int(a_num[key])
+                delta = app_val - nwea_val
+            else:
+                nwea_s = nwea_students[key]
+                app_s = app_students[key]
+                if is_range:
+                    d = compare_range(nwea_s.get(field, {}), app_s.get(field, {}))
+                else:
+                    d = compare_exact_int(nwea_s.get(field), app_s.get(field))
+                if not d:
+                    continue
+                nwea_val = d.get('nwea_mid', d.get('nwea'))
+                app_val = d.get('app_mid', d.get('app'))
+                delta = d.get('delta')
+            diff_counter[field] += 1
+            if len(diff_details[field]) < MAX_DETAIL_ROWS:
+                student_id, subject = split_keys[key]
+                diff_details[field].append(_detail_row(
+                    nwea_students[key], student_id, subject,
+                    nwea_val, app_val, delta))
+
+    return diff_counter, diff_details
+
+
+def _collect_summary_diffs(nwea_students, app_students, matched_keys):
+    if pd is not None:
+        return _collect_summary_diffs_pandas(nwea_students, app_students, matched_keys)
+    return _collect_summary_diffs_python(nwea_students, app_students, matched_keys)
+
+
+def generate_report(nwea_students, app_students):
+    """Generate full comparison report in markdown from the two student
+    lookups (see load_student_lookup)."""
+    lines = []
+
+    # Dict views support set algebra directly, so the six set() copies the
+    # three expressions used to build are avoided.
+    nwea_keys = nwea_students.keys()
+    app_keys = app_students.keys()
+    # Sorted once so identical inputs always produce identical reports:
+    # the truncated detail tables keep whichever rows are seen first, so
+    # set-iteration (hash) order must not leak into the output.
+    matched_keys = sorted(nwea_keys & app_keys)
+    nwea_only = nwea_keys - app_keys
+    app_only = app_keys - nwea_keys
 
     lines.append('# Comparison Report')
     lines.append('')
@@ -331,7 +598,8 @@ def generate_report(nwea_data, app_data):
         lines.append('')
         for key in sorted(nwea_only):
             s = nwea_students[key]
-            lines.append(f"- {s.get('studentName', '?')} ({key.split('|')[0]}) {key.split('|')[1]}")
+            student_id, subject = key.split('|', 1)
+            lines.append(f"- {s.get('studentName', '?')} ({student_id}) {subject}")
         lines.append('')
 
     if app_only:
@@ -339,32 +607,13 @@ def generate_report(nwea_data, app_data):
         lines.append('')
         for key in sorted(app_only):
             s = app_students[key]
-            lines.append(f"- {s.get('studentName', '?')} ({key.split('|')[0]}) {key.split('|')[1]}")
+            student_id, subject = key.split('|', 1)
+            lines.append(f"- {s.get('studentName', '?')} ({student_id}) {subject}")
         lines.append('')
 
     # Compare matched students field by field
-    diff_counter = Counter()
-    diff_details = {field: [] for field, _ in SUMMARY_FIELDS}
-
-    for key in sorted(matched_keys):
-        nwea_s = nwea_students[key]
-        app_s = app_students[key]
-        diffs = compare_student(nwea_s, app_s)
-
-        for field, label in SUMMARY_FIELDS:
-            if field in diffs:
-                diff_counter[field] += 1
-                d = diffs[field]
-                nwea_val = d.get('nwea_mid', d.get('nwea'))
-                app_val = d.get('app_mid', d.get('app'))
-                delta = d.get('delta')
-                diff_details[field].append({
-                    'student': f"{nwea_s.get('studentName', '?')} ({key.split('|')[0]})",
-                    'subject': key.split('|')[1],
-                    'nwea': nwea_val,
-                    'app': app_val,
-                    'delta': delta,
-                })
+    diff_counter, diff_details = _collect_summary_diffs(
+        nwea_students, app_students, matched_keys)
 
     # Summary table
     lines.append('## Differences by Field')
@@ -389,15 +638,16 @@ def generate_report(nwea_data, app_data):
         details = diff_details.get(field, [])
         if not details:
             continue
-        lines.append(f'### {label} \u2014 {len(details)} differences')
+        count = diff_counter[field]
+        lines.append(f'### {label} \u2014 {count} differences')
         lines.append('')
         lines.append('| Student | Subject | NWEA | App | Delta |')
         lines.append('|---------|---------|------|-----|-------|')
-        for d in details[:30]:
+        for d in details:
             delta_str = f"{d['delta']:+.0f}" if d['delta'] is not None else '\u2014'
             lines.append(f"| {d['student']} | {d['subject']} | {d['nwea']} | {d['app']} | {delta_str} |")
-        if len(details) > 30:
-            lines.append(f"| ... | ... | ... | ... | ({len(details) - 30} more) |")
+        if count > MAX_DETAIL_ROWS:
+            lines.append(f"| ... | ... | ... | ... | ({count - MAX_DETAIL_ROWS} more) |")
         lines.append('')
 
     return '\n'.join(lines)
@@ -410,13 +660,10 @@ def main():
     parser.add_argument('--output', '-o', default=None, help='Output markdown file path')
     args = parser.parse_args()
 
-    with open(args.nwea_json, 'r') as f:
-        nwea_data = json.load(f)
-
-    with open(args.app_json, 'r') as f:
-        app_data = json.load(f)
+    nwea_students = load_student_lookup(args.nwea_json)
+    app_students = load_student_lookup(args.app_json)
 
-    report = generate_report(nwea_data, app_data)
+    report = generate_report(nwea_students, app_students)
 
     if args.output:
         Path(args.output).write_text(report)